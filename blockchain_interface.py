@@ -3,77 +3,204 @@ Blockchain Integration for F1-AI Racing Game
 Handles Web3 interactions with the smart contract
 """
 
-from web3 import Web3
+import asyncio
+import aiohttp
+from web3 import AsyncWeb3, AsyncHTTPProvider
+from web3.exceptions import TransactionNotFound
 from eth_account import Account
 import json
 
 
 class BlockchainInterface:
+    # Static gas bound for registerCar: fixed struct/mapping writes plus
+    # one new storage word (SSTORE + calldata) per 32 bytes of encrypted car.
+    # It fits a block only for payloads up to a few KB (about 40 KB at a
+    # 30M block gas limit); a packed n=8192 ciphertext is far larger, and
+    # such calls fall back to eth_estimateGas
+    REGISTER_CAR_GAS = 350_000
+    REGISTER_CAR_GAS_PER_WORD = 24_000
+
     def __init__(self, rpc_url: str, contract_address: str, contract_abi: list, private_key: str):
         """
         Initialize blockchain interface
+        Call connect() before using it and close() when done
         """
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
-        self.contract_address = Web3.to_checksum_address(contract_address)
-        self.contract = self.w3.eth.contract(address=self.contract_address, abi=contract_abi)
+        self.rpc_url = rpc_url
+        self.w3 = AsyncWeb3(AsyncHTTPProvider(
+            rpc_url,
+            request_kwargs={'timeout': aiohttp.ClientTimeout(total=30)}
+        ))
+        self.contract_address = AsyncWeb3.to_checksum_address(contract_address)
+        # decode_tuples returns RaceEntry structs as named tuples
+        self.contract = self.w3.eth.contract(
+            address=self.contract_address,
+            abi=contract_abi,
+            decode_tuples=True
+        )
+        self._register_fn = self.contract.functions.registerCar
+
+        # Fixed EIP-1559 fee caps
+        self._max_fee_wei = AsyncWeb3.to_wei(100, 'gwei')
+        self._max_prio_wei = AsyncWeb3.to_wei(2, 'gwei')
         
         # Set up account
         self.account = Account.from_key(private_key)
         self.address = self.account.address
-        
-        if not self.w3.is_connected():
+        self._sign = self.account.sign_transaction
+
+        # Shared HTTP session, chain id, block gas limit and next nonce, set up in connect()
+        self.session = None
+        self.chain_id = None
+        self.block_gas_limit = None
+        self._nonce = None
+
+    async def connect(self):
+        """Open the shared HTTP session and check the connection"""
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=60)
+        )
+        await self.w3.provider.cache_async_session(self.session)
+
+        if not await self.w3.is_connected():
             raise Exception("Failed to connect to blockchain")
+
+        self.chain_id = await self.w3.eth.chain_id
+        self.block_gas_limit = (await self.w3.eth.get_block('latest'))['gasLimit']
+        await self._refresh_nonce()
         
-        print(f"Connected to blockchain at {rpc_url}")
+        print(f"Connected to blockchain at {self.rpc_url}")
         print(f"Using account: {self.address}")
+
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
     
-    def register_car(self, user_id: int, encrypted_car: bytes, signature: bytes):
-        """Submit car registration on-chain"""
-        try:
-            gas_estimate = self.contract.functions.registerCar(
-                user_id,
-                encrypted_car,
-                signature
-            ).estimate_gas({'from': self.address})
+    async def _refresh_nonce(self):
+        """Re-read the next nonce from the chain"""
+        self._nonce = await self.w3.eth.get_transaction_count(self.address, 'pending')
+
+    def _registration_gas(self, encrypted_car: bytes):
+        """
+        Upper-bound gas for a registerCar call, without an eth_estimateGas round-trip
+        Returns None when the bound exceeds the block gas limit
+        """
+        words = (len(encrypted_car) + 31) // 32
+        gas = self.REGISTER_CAR_GAS + words * self.REGISTER_CAR_GAS_PER_WORD
+        return gas if gas <= self.block_gas_limit else None
+
+    async def submit_register_car(self, user_id: int, encrypted_car: bytes, signature: bytes):
+        """
+        Sign and send a car registration without waiting for it to be mined
+        Returns the transaction hash, or None if sending failed
+        """
+        # Taken before the first await so concurrent submissions get distinct nonces
+        nonce = self._nonce
+        self._nonce += 1
+
+        tx_params = {
+            'from': self.address,
+            'chainId': self.chain_id,
+            'nonce': nonce,
+            'maxFeePerGas': self._max_fee_wei,
+            'maxPriorityFeePerGas': self._max_prio_wei
+        }
+        # Without an explicit gas limit, build_transaction runs eth_estimateGas,
+        # which also reports a revert before anything is sent
+        gas = self._registration_gas(encrypted_car)
+        if gas is not None:
+            tx_params['gas'] = gas
 
-            txn = self.contract.functions.registerCar(
+        try:
+            txn = await self._register_fn(
                 user_id,
                 encrypted_car,
                 signature
-            ).build_transaction({
-                'from': self.address,
-                'nonce': self.w3.eth.get_transaction_count(self.address),
-                'gas': gas_estimate + 50000,
-                'maxFeePerGas': self.w3.to_wei(100, 'gwei'),
-                'maxPriorityFeePerGas': self.w3.to_wei(2, 'gwei')
-            })
+            ).build_transaction(tx_params)
 
-            signed = self.account.sign_transaction(txn)
-            tx_hash = self.w3.eth.send_raw_transaction(signed.rawTransaction)
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            signed = self._sign(txn)
+            tx_hash = await self.w3.eth.send_raw_transaction(signed.raw_transaction)
 
-            print(f"Car registered on chain for user {user_id}. Tx: {tx_hash.hex()}")
-            return receipt
+            print(f"Car registration sent for user {user_id}. Tx: {tx_hash.hex()}")
+            return tx_hash
 
         except Exception as e:
             print(f"Error registering car: {e}")
         return None
 
-    
-    def get_entries(self) -> list:
-        """Get all entries from chain"""
+    async def wait_receipts(self, tx_hashes: list, timeout: float = 120, poll_latency: float = 0.5) -> list:
+        """
+        Wait for several transactions, polling every pending receipt
+        in a single JSON-RPC batch per cycle
+        Returns one receipt (or None if not mined before the timeout) per hash
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        receipts = {}
+        pending = [tx_hash for tx_hash in tx_hashes if tx_hash is not None]
+
+        while pending and loop.time() < deadline:
+            try:
+                async with self.w3.batch_requests() as batch:
+                    for tx_hash in pending:
+                        batch.add(self.w3.eth.get_transaction_receipt(tx_hash))
+                    results = await batch.async_execute()
+            except TransactionNotFound:
+                # A batch containing a not-yet-mined transaction fails as a whole,
+                # so ask for each receipt separately to keep the mined ones
+                results = await asyncio.gather(*[
+                    self.w3.eth.get_transaction_receipt(tx_hash) for tx_hash in pending
+                ], return_exceptions=True)
+                results = [None if isinstance(r, Exception) else r for r in results]
+            except Exception as e:
+                # Transport and RPC errors are retried until the deadline
+                print(f"Error polling receipts: {e}")
+                results = [None] * len(pending)
+
+            for tx_hash, receipt in zip(pending, results):
+                if receipt is not None:
+                    receipts[tx_hash] = receipt
+            pending = [tx_hash for tx_hash in pending if tx_hash not in receipts]
+
+            if pending:
+                await asyncio.sleep(poll_latency)
+
+        return [receipts.get(tx_hash) for tx_hash in tx_hashes]
+
+    async def register_cars(self, registrations: list) -> list:
+        """
+        Submit several car registrations on-chain, then wait for all of them
+        registrations: list of (user_id, encrypted_car, signature) tuples
+        Returns one receipt (or None) per registration; a reverted registration,
+        e.g. one that ran out of gas, still has a receipt with status 0
+        """
+        tx_hashes = await asyncio.gather(*[
+            self.submit_register_car(user_id, encrypted_car, signature)
+            for user_id, encrypted_car, signature in registrations
+        ])
+        receipts = await self.wait_receipts(tx_hashes)
+
+        # A failed send leaves the local counter ahead of the chain
+        if any(receipt is None for receipt in receipts):
+            await self._refresh_nonce()
+
+        return receipts
+
+    async def register_car(self, user_id: int, encrypted_car: bytes, signature: bytes):
+        """Submit car registration on-chain"""
+        receipts = await self.register_cars([(user_id, encrypted_car, signature)])
+        return receipts[0]
+
+
+    async def get_entries(self) -> list:
+        """
+        Get all entries from chain
+        Each entry is a named tuple with the contract's RaceEntry fields
+        (playerAddress, userId, encryptedCar, signature, timestamp)
+        """
         try:
-            entries = self.contract.functions.getAllEntries().call()
-            parsed_entries = []
-            for entry in entries:
-                parsed_entries.append({
-                    'player_address': entry[0],
-                    'user_id': entry[1],
-                    'encrypted_car': entry[2],
-                    'signature': entry[3],
-                    'timestamp': entry[4]
-                })
-            return parsed_entries
+            return await self.contract.functions.getAllEntries().call()
 
         except Exception as e:
             print(f"Error reading entries: {e}")
@@ -10,56 +10,76 @@ from player import Player
 from server import Server
 
 from blockchain_interface import BlockchainInterface
-import json
+from demo_output import buffered_output, flush_output
+import asyncio
+import logging
+import sys
+import orjson
 
 
-def main():
-    print("=" * 70)
-    print("F1-AI RACING GAME - BLOCKCHAIN ENABLED")
-    print("=" * 70)
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+
+async def main():
+    # Console logging when run outside buffered_output(), which installs its own handler
+    logging.basicConfig(format="%(message)s", stream=sys.stdout)
+    
+    log.info("=" * 70)
+    log.info("F1-AI RACING GAME - BLOCKCHAIN ENABLED")
+    log.info("=" * 70)
     
     # PHASE 1: SYSTEM INITIALIZATION
-    print("\n[1.1] Initializing External Program...")
+    log.info("\n[1.1] Initializing External Program...")
     program = ExternalProgram()
-    print("✓ External Program ready")
+    log.info("✓ External Program ready")
     
-    print("\n[1.2] Distributing encrypted polynomial + public keys...")
+    log.info("\n[1.2] Distributing encrypted polynomial + public keys...")
     public_keys = program.get_public_keys()
     encrypted_polynomial = program.get_encrypted_polynomial()
     
-    print("\n[1.3] Initializing Server...")
-    server = Server(public_keys, encrypted_polynomial)
-    print("✓ Server ready")
+    log.info("\n[1.3] Initializing Server...")
+    with Server(public_keys, encrypted_polynomial) as server:
+        log.info("✓ Server ready")
 
-    print("\n[1.4] Connecting to Blockchain...")
+        log.info("\n[1.4] Connecting to Blockchain...")
 
-    with open("deployment_ganache.json", "r") as f:
-        deploy_info = json.load(f)
+        with open("deployment_ganache.json", "rb") as f:
+            deploy_info = orjson.loads(f.read())
 
-    rpc_url = "http://host.docker.internal:8545"
-    contract_address = deploy_info["contract_address"]
-    contract_abi = deploy_info["abi"]
+        rpc_url = "http://host.docker.internal:8545"
+        contract_address = deploy_info["contract_address"]
+        contract_abi = deploy_info["abi"]
 
    
-    private_key = "0xa4b2e7d374c62957d5067828ae5f31802da8af884e8cac24a40f95be494a55a6"
+        private_key = "0xa4b2e7d374c62957d5067828ae5f31802da8af884e8cac24a40f95be494a55a6"
+
+        blockchain = BlockchainInterface(
+            rpc_url,
+            contract_address,
+            contract_abi,
+            private_key
+        )
+        await blockchain.connect()
+
+        try:
+            await run_game(program, public_keys, encrypted_polynomial, server, blockchain)
+        finally:
+            await blockchain.close()
 
-    blockchain = BlockchainInterface(
-        rpc_url,
-        contract_address,
-        contract_abi,
-        private_key
-    )
 
+async def run_game(program, public_keys, encrypted_polynomial, server, blockchain):
     # PHASE 2: PLAYER REGISTRATION
-    print("\n" + "=" * 70)
-    print("PHASE 2: PLAYER REGISTRATION")
-    print("=" * 70)
+    log.info("\n" + "=" * 70)
+    log.info("PHASE 2: PLAYER REGISTRATION")
+    log.info("=" * 70)
+    flush_output()
     
     players = []
     num_players = 3
     
     for i in range(num_players):
-        print(f"\nRegistering Player {i+1}...")
+        log.info(f"\nRegistering Player {i+1}...")
         
         user_id, encrypted_car, signature = program.register_user()
         
@@ -67,87 +87,103 @@ def main():
         player.add_car(encrypted_car, signature)
         
         decoded = program.decrypt_car(encrypted_car)
-        print(f"  User {user_id} initial car: {decoded[:3]}... (3 of 10)")
-        print(f"  XPF balance: {player.get_balance()}")
+        log.info(f"  User {user_id} initial car: {decoded[:3]}... (3 of 10)")
+        log.info(f"  XPF balance: {player.get_balance()}")
         
         players.append(player)
+
+    players_by_id = {p.user_id: p for p in players}
     
     # PHASE 3: TRAINING
-    print("\n" + "=" * 70)
-    print("PHASE 3: TRAINING")
-    print("=" * 70)
+    log.info("\n" + "=" * 70)
+    log.info("PHASE 3: TRAINING")
+    log.info("=" * 70)
+    flush_output()
     
     for player in players:
-        print(f"\nTraining Player {player.user_id}:")
+        log.info(f"\nTraining Player {player.user_id}:")
         for r in range(3):
-            print(f"  Round {r+1}/3...", end=" ")
-            if player.train_car(0, program):
-                print("✓")
-            else:
-                print("✗")
+            success = player.train_car(0, program)
+            log.info(f"  Round {r+1}/3... {'✓' if success else '✗'}")
     
     # ✅ PHASE 4: REGISTER CARS ON-CHAIN
-    print("\n" + "=" * 70)
-    print("PHASE 4: ON-CHAIN REGISTRATION")
-    print("=" * 70)
+    log.info("\n" + "=" * 70)
+    log.info("PHASE 4: ON-CHAIN REGISTRATION")
+    log.info("=" * 70)
+    flush_output()
 
+    registrations = []
     for player in players:
-        print(f"\nPlayer {player.user_id}: entering race...")
-        
+        log.info(f"\nPlayer {player.user_id}: entering race...")
+
         # deduct fee + sign updated car
         if not player.enter_race(0):
-            print("  ✗ Failed: insufficient balance or other error")
+            log.info("  ✗ Failed: insufficient balance or other error")
             continue
 
         encrypted_car, signature, _ = player.prepare_for_race(0)
+        registrations.append((player.user_id, encrypted_car, signature))
 
-        receipt = blockchain.register_car(
-            player.user_id,
-            encrypted_car,
-            signature
-        )
-        
-        if receipt:
-            print("  ✓ On-chain registration success")
+    # all transactions are sent first, then their receipts are awaited together
+    log.info("\n[4.1] Submitting registrations to blockchain...")
+    receipts = await blockchain.register_cars(registrations)
+
+    for (user_id, _, _), receipt in zip(registrations, receipts):
+        if receipt and receipt['status'] == 1:
+            log.info(f"  ✓ Player {user_id}: on-chain registration success")
+        elif receipt:
+            log.info(f"  ✗ Player {user_id}: registration transaction reverted")
         else:
-            print("  ✗ Failed submitting to blockchain")
+            log.info(f"  ✗ Player {user_id}: failed submitting to blockchain")
     
     # ✅ Retrieve on-chain entries and feed server
-    print("\n[4.2] Fetching entries from blockchain...")
-    chain_entries = blockchain.get_entries()
+    log.info("\n[4.2] Fetching entries from blockchain...")
+    chain_entries = await blockchain.get_entries()
 
     for e in chain_entries:
         server.accept_race_entry(
-            e['user_id'],
-            e['encrypted_car'],
-            e['signature']
+            e.userId,
+            e.encryptedCar,
+            e.signature
         )
 
-    print(f"✓ Total on-chain participants received: {server.get_current_entries()}")
+    log.info(f"✓ Total on-chain participants received: {server.get_current_entries()}")
 
     # PHASE 5: RUN THE RACE
-    print("\n" + "=" * 70)
-    print("PHASE 5: RUNNING RACE")
-    print("=" * 70)
+    log.info("\n" + "=" * 70)
+    log.info("PHASE 5: RUNNING RACE")
+    log.info("=" * 70)
+    flush_output()
     
     race_result = server.run_race(program)
     
     if race_result:
         winner = race_result['rankings'][0]
-        print(f"\n🏆 Winner is Player {winner['user_id']} (speed {winner['speed']})")
+        log.info(f"\n🏆 Winner is Player {winner['user_id']} (speed {winner['speed']})")
         
         # give reward locally
-        for p in players:
-            if p.user_id == winner['user_id']:
-                p.receive_winnings(100)
-                print(f"Prize paid. New balance: {p.get_balance()} XPF")
+        winner_player = players_by_id.get(winner['user_id'])
+        if winner_player:
+            winner_player.receive_winnings(100)
+            log.info(f"Prize paid. New balance: {winner_player.get_balance()} XPF")
 
-    print("\nDemo complete.")
+    log.info("\nDemo complete.")
+
+
+def use_uvloop():
+    """Switch asyncio to the libuv-based uvloop when it is installed"""
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
 
 if __name__ == "__main__":
     try:
-        main()
+        use_uvloop()
+        with buffered_output():
+            asyncio.run(main())
     except Exception as e:
         print(f"\nERROR: {e}")
         import traceback
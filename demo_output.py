@@ -0,0 +1,44 @@
+"""
+Buffered console output for the F1-AI Racing demos
+Demo progress messages (logging) and prints from the game modules share one
+8 KiB buffer that is written out at phase boundaries instead of on every line
+"""
+
+import logging
+import sys
+from contextlib import contextmanager, redirect_stdout
+
+
+class PhaseHandler(logging.StreamHandler):
+    """StreamHandler that does not flush after every record"""
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+@contextmanager
+def buffered_output(buffer_size: int = 8192):
+    """Route logging and stdout through a single buffered stream"""
+    sys.stdout.flush()
+    stream = open(sys.stdout.fileno(), 'w', buffering=buffer_size,
+                  encoding='utf-8', closefd=False)
+
+    handler = PhaseHandler(stream)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    root = logging.getLogger()
+    root.addHandler(handler)
+
+    try:
+        with redirect_stdout(stream):
+            yield
+    finally:
+        root.removeHandler(handler)
+        stream.close()
+
+
+def flush_output():
+    """Write out buffered output, called at phase boundaries"""
+    sys.stdout.flush()
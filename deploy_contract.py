@@ -3,23 +3,42 @@ Deploy F1AIRacing Smart Contract
 Supports multiple networks: local (Ganache), testnets (Sepolia, Mumbai), mainnet
 """
 
-from web3 import Web3
-from eth_account import Account
-from solcx import compile_standard, install_solc
-import json
+# web3, eth_account, solcx and requests are imported inside the functions
+# that need them so --help and the interactive menu start instantly
+from pathlib import Path
+import hashlib
+import orjson
+import argparse
 import sys
 import os
 
 
+SOLC_VERSION = '0.8.20'
+SOLC_CACHE_DIR = Path('.solcache')
+
+
 def compile_contract():
-    """Compile the Solidity contract"""
-    print("Installing Solidity compiler...")
-    install_solc('0.8.20')
-    
+    """Compile the Solidity contract, reusing cached output when the source is unchanged"""
     print("Reading contract source...")
     with open('F1AIRacing.sol', 'r') as f:
         contract_source = f.read()
     
+    source_hash = hashlib.blake2b(
+        (SOLC_VERSION + contract_source).encode(), digest_size=16
+    ).hexdigest()
+    cache_path = SOLC_CACHE_DIR / f'{source_hash}.json'
+    
+    if cache_path.exists():
+        cached = orjson.loads(cache_path.read_bytes())
+        print("✓ Using cached compilation output")
+        return cached['bytecode'], cached['abi']
+    
+    from solcx import compile_standard, install_solc, get_installed_solc_versions
+    
+    if SOLC_VERSION not in map(str, get_installed_solc_versions()):
+        print("Installing Solidity compiler...")
+        install_solc(SOLC_VERSION)
+    
     print("Compiling contract...")
     compiled_sol = compile_standard(
         {
@@ -37,7 +56,7 @@ def compile_contract():
                 }
             },
         },
-        solc_version="0.8.20",
+        solc_version=SOLC_VERSION,
     )
     
     # Extract contract data
@@ -45,6 +64,9 @@ def compile_contract():
     bytecode = contract_data['evm']['bytecode']['object']
     abi = contract_data['abi']
     
+    SOLC_CACHE_DIR.mkdir(exist_ok=True)
+    cache_path.write_bytes(orjson.dumps({'bytecode': bytecode, 'abi': abi}))
+    
     print("✓ Contract compiled successfully")
     return bytecode, abi
 
@@ -57,14 +79,29 @@ def save_deployment_info(contract_address, abi, network):
         'network': network
     }
     
-    with open(f'deployment_{network}.json', 'w') as f:
-        json.dump(deployment_info, f, indent=2)
+    with open(f'deployment_{network}.json', 'wb') as f:
+        f.write(orjson.dumps(deployment_info, option=orjson.OPT_INDENT_2))
     
     print(f"✓ Deployment info saved to deployment_{network}.json")
 
 
+def _make_session():
+    """Persistent keep-alive HTTP session shared by every RPC call"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=3)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Connection': 'keep-alive'})
+    return session
+
+
 def deploy_contract(rpc_url, private_key, server_address, network_name="local"):
     """Deploy contract to specified network"""
+    from web3 import Web3
+    from eth_account import Account
     
     print(f"\n{'='*70}")
     print(f"DEPLOYING F1AI RACING CONTRACT TO {network_name.upper()}")
@@ -75,13 +112,14 @@ def deploy_contract(rpc_url, private_key, server_address, network_name="local"):
     
     # Connect to network
     print(f"Connecting to {network_name} at {rpc_url}...")
-    w3 = Web3(Web3.HTTPProvider(rpc_url))
+    w3 = Web3(Web3.HTTPProvider(rpc_url, session=_make_session(), request_kwargs={'timeout': 30}))
     
     if not w3.is_connected():
         print("✗ Failed to connect to network")
         return None, None
     
-    print(f"✓ Connected to network (Chain ID: {w3.eth.chain_id})")
+    chain_id = w3.eth.chain_id
+    print(f"✓ Connected to network (Chain ID: {chain_id})")
     
     # Setup account
     account = Account.from_key(private_key)
@@ -123,6 +161,7 @@ def deploy_contract(rpc_url, private_key, server_address, network_name="local"):
     
     transaction = F1AIRacing.constructor(server_address).build_transaction({
         'from': account.address,
+        'chainId': chain_id,
         'nonce': nonce,
         'gas': gas_estimate + 100000,  # Add buffer
         'gasPrice': gas_price
@@ -134,7 +173,7 @@ def deploy_contract(rpc_url, private_key, server_address, network_name="local"):
     
     # Send transaction
     print("Sending transaction...")
-    tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+    tx_hash = w3.eth.send_raw_transaction(signed_txn.raw_transaction)
     print(f"✓ Transaction sent: {tx_hash.hex()}")
     
     # Wait for receipt
@@ -237,6 +276,44 @@ def interactive_deploy():
         return None, None
 
 
+def dispatch(args, parser):
+    """Deploy to the network selected on the command line"""
+    required = {
+        'ganache': [],
+        'sepolia': ['private_key', 'server_address', 'infura_key'],
+        'mumbai': ['private_key', 'server_address', 'infura_key'],
+        'custom': ['rpc_url', 'private_key', 'server_address'],
+    }[args.network]
+    missing = [name for name in required if not getattr(args, name)]
+    if missing:
+        parser.error(f"--network {args.network} requires " +
+                     ", ".join('--' + name.replace('_', '-') for name in missing))
+    
+    if args.network == 'ganache':
+        return deploy_local_ganache()
+    elif args.network == 'sepolia':
+        return deploy_sepolia(args.private_key, args.server_address, args.infura_key)
+    elif args.network == 'mumbai':
+        return deploy_mumbai(args.private_key, args.server_address, args.infura_key)
+    else:
+        return deploy_contract(args.rpc_url, args.private_key, args.server_address, args.network_name)
+
+
+def cli(argv=None):
+    """Non-interactive deployment driven by command-line flags"""
+    parser = argparse.ArgumentParser(description="Deploy the F1AIRacing smart contract")
+    parser.add_argument('--network', choices=['ganache', 'sepolia', 'mumbai', 'custom'],
+                        default='ganache', help="Target network (default: ganache)")
+    parser.add_argument('--private-key', help="Deployer private key (with 0x prefix)")
+    parser.add_argument('--server-address', help="Server address passed to the constructor")
+    parser.add_argument('--infura-key', help="Infura API key (sepolia, mumbai)")
+    parser.add_argument('--rpc-url', help="RPC URL (custom)")
+    parser.add_argument('--network-name', default='custom',
+                        help="Name used for the deployment file (custom, default: custom)")
+    args = parser.parse_args(argv)
+    return dispatch(args, parser)
+
+
 if __name__ == "__main__":
     print("""
 ╔══════════════════════════════════════════════════════════════════════╗
@@ -255,7 +332,11 @@ if __name__ == "__main__":
         sys.exit(1)
     
     try:
-        contract_address, abi = interactive_deploy()
+        # Prompt only when no flags are given
+        if len(sys.argv) == 1:
+            contract_address, abi = interactive_deploy()
+        else:
+            contract_address, abi = cli()
         
         if contract_address:
             print("\n" + "="*70)
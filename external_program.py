@@ -5,28 +5,42 @@ Uses Ed25519 (via PyNaCl) for signatures and BFV homomorphic encryption
 """
 
 import numpy as np
-from Pyfhel import Pyfhel, PyCtxt
+from Pyfhel import Pyfhel, PyCtxt, PyPtxt
+from speed_polynomial import POLYNOMIAL_OFFSETS, evaluate_speed
 import nacl.signing
 import nacl.encoding
 import nacl.exceptions
-import pickle
 import json
+import mmap
+import struct
 from typing import Tuple, List
 import secrets
 
 
 class ExternalProgram:
+    # Cross terms a_i * a_j (i < j) are stored from coefficient 21 in (i, j) order;
+    # the layout gathers them sorted by offset j - i, then by slot i
+    _CROSS_I, _CROSS_J = np.triu_indices(10, k=1)
+    _LAYOUT_INDEX = np.concatenate([np.arange(21), 21 + np.lexsort((_CROSS_I, _CROSS_J - _CROSS_I))])
+    _LAYOUT_SPLITS = POLYNOMIAL_OFFSETS[1:]
+    
+    # BFV parameters: players and the server only hold encrypted coefficients,
+    # so their evaluation (car * coefficients, then * car) needs depth 2.
+    # t = 65537 is prime with t = 1 mod 2n, so batching stays available
+    HE_PARAMETERS = {'n': 8192, 't': 65537}
+    
     def __init__(self):
         """Initialize the external program with key generation"""
         print("Generating Ed25519 keys with PyNaCl...")
         # Generate Ed25519 signing keys using PyNaCl
         self.signing_key = nacl.signing.SigningKey.generate()
         self.verify_key = self.signing_key.verify_key
+        self._verify = self.verify_key.verify
         
         print("Initializing BFV homomorphic encryption...")
         # Initialize Pyfhel for BFV homomorphic encryption
         self.HE = Pyfhel()
-        self.HE.contextGen(scheme='bfv', n=8192, t_bits=20, t=65537)
+        self.HE.contextGen(scheme='bfv', **self.HE_PARAMETERS)
         self.HE.keyGen()
         self.HE.relinKeyGen()
         self.HE.rotateKeyGen()
@@ -36,8 +50,12 @@ class ExternalProgram:
         self.speed_polynomial_coeffs = self._generate_speed_polynomial()
         
         print("Encrypting polynomial coefficients...")
-        # Encrypt the polynomial coefficients
-        self.encrypted_polynomial = self._encrypt_polynomial(self.speed_polynomial_coeffs)
+        # Encrypt all the polynomial coefficients in a single SIMD ciphertext
+        layout = self._layout_polynomial(self.speed_polynomial_coeffs)
+        self.encrypted_polynomial = self._encrypt_polynomial(layout)
+        # The program knows the coefficients, so its own evaluations use
+        # plaintext-ciphertext multiplication instead
+        self.plain_polynomial = self._encode_polynomial(layout)
         
         # Store car database (encrypted cars with signatures)
         self.car_database = {}
@@ -46,16 +64,27 @@ class ExternalProgram:
         
     def _generate_speed_polynomial(self) -> np.ndarray:
         """Generate random coefficients for the speed polynomial"""
-        coeffs = np.random.randint(1, 1000, size=66)
+        coeffs = np.random.default_rng().integers(1, 1000, size=66, dtype=np.int64)
         return coeffs
 
-    def _encrypt_polynomial(self, coeffs: np.ndarray) -> List[PyCtxt]:
-        """Encrypt polynomial coefficients"""
-        encrypted_coeffs = []
-        for coeff in coeffs:
-            ctxt = self.HE.encryptInt(np.array([int(coeff)]))
-            encrypted_coeffs.append(ctxt)
-        return encrypted_coeffs
+    def _layout_polynomial(self, coeffs: np.ndarray) -> List[np.ndarray]:
+        """
+        Arrange the 66 coefficients as slot vectors for the rotation-based evaluation:
+        [constant], linear (10), quadratic (10), then one vector per offset r = 1..9
+        holding the coefficient of a_i * a_(i+r) in slot i
+        """
+        return np.split(coeffs[self._LAYOUT_INDEX], self._LAYOUT_SPLITS)
+
+    def _encrypt_polynomial(self, layout: List[np.ndarray]) -> PyCtxt:
+        """
+        Encrypt the polynomial coefficient vectors back to back in one ciphertext
+        (slots 0-65); peers rotate it to bring each vector to slot 0
+        """
+        return self.HE.encryptInt(np.concatenate(layout))
+
+    def _encode_polynomial(self, layout: List[np.ndarray]) -> List[PyPtxt]:
+        """Encode polynomial coefficient vectors as plaintexts"""
+        return [self.HE.encodeInt(vector) for vector in layout]
     
     def get_public_keys(self) -> dict:
         """Export public keys for distribution to server and players"""
@@ -67,9 +96,9 @@ class ExternalProgram:
             'he_rotate_key': self.HE.to_bytes_rotate_key(),
         }
     
-    def get_encrypted_polynomial(self) -> List[bytes]:
+    def get_encrypted_polynomial(self) -> bytes:
         """Get encrypted polynomial coefficients for distribution"""
-        return [ctxt.to_bytes() for ctxt in self.encrypted_polynomial]
+        return self.encrypted_polynomial.to_bytes()
     
     def register_user(self) -> Tuple[int, bytes, bytes]:
         """
@@ -80,7 +109,7 @@ class ExternalProgram:
         user_id = self.user_counter
         
         # Generate random car attributes (10 values between 1 and 999)
-        car_attributes = np.array([secrets.randbelow(999) + 1 for _ in range(10)])
+        car_attributes = np.frombuffer(secrets.token_bytes(40), dtype='<u4') % 999 + 1
         
         # Encrypt the car
         encrypted_car = self._encrypt_car(car_attributes)
@@ -96,17 +125,11 @@ class ExternalProgram:
         
         return user_id, encrypted_car, signature
     
-    # def _encrypt_car(self, attributes: np.ndarray) -> bytes:
-    #     """Encrypt car attributes"""
-    #     # Encrypt all attributes in a single ciphertext
-    #     ctxt = self.HE.encryptInt(attributes.astype(np.int64))
-    #     return ctxt.to_bytes()
     def _encrypt_car(self, attributes: np.ndarray) -> bytes:
-        encrypted_attrs = []
-        for attr in attributes:
-            ctxt = self.HE.encryptInt(np.array([int(attr)]))
-            encrypted_attrs.append(ctxt.to_bytes())
-        return pickle.dumps(encrypted_attrs)
+        """Encrypt car attributes"""
+        # Encrypt all attributes in a single ciphertext, one per batching slot
+        ctxt = self.HE.encryptInt(attributes.astype(np.int64))
+        return ctxt.to_bytes()
     
     def _sign_car(self, encrypted_car: bytes) -> bytes:
         """Sign an encrypted car with Ed25519 using PyNaCl"""
@@ -116,7 +139,7 @@ class ExternalProgram:
     def verify_signature(self, encrypted_car: bytes, signature: bytes) -> bool:
         """Verify a car's signature using PyNaCl"""
         try:
-            self.verify_key.verify(encrypted_car, signature)
+            self._verify(encrypted_car, signature)
             return True
         except nacl.exceptions.BadSignatureError:
             return False
@@ -127,18 +150,13 @@ class ExternalProgram:
             print("Invalid signature!")
             return None, None, False
 
-        # Unpickle to get list of encrypted attributes
-        encrypted_attrs = pickle.loads(encrypted_car)
-        modifications = np.array([secrets.randbelow(39) - 19 for _ in range(10)])
+        enc_car = PyCtxt(pyfhel=self.HE, bytestring=encrypted_car)
+        modifications = (np.frombuffer(secrets.token_bytes(40), dtype='<u4') % 39).astype(np.int64) - 19
 
-        new_encrypted_attrs = []
-        for i, enc_attr_bytes in enumerate(encrypted_attrs):
-            enc_attr = PyCtxt(pyfhel=self.HE, bytestring=enc_attr_bytes)
-            enc_mod = self.HE.encryptInt(np.array([int(modifications[i])]))
-            enc_new_attr = enc_attr + enc_mod
-            new_encrypted_attrs.append(enc_new_attr.to_bytes())
-
-        new_encrypted_car = pickle.dumps(new_encrypted_attrs)
+        # All 10 modifications are added slot-wise in a single operation; they are
+        # encrypted so the fresh randomness hides them from anyone holding the old car
+        enc_car += self.HE.encryptInt(modifications)
+        new_encrypted_car = enc_car.to_bytes()
         new_signature = self._sign_car(new_encrypted_car)
 
         if user_id in self.car_database:
@@ -149,32 +167,8 @@ class ExternalProgram:
     
     def calculate_encrypted_speed(self, encrypted_car: bytes) -> bytes:
         """Calculate the encrypted speed of a car using the encrypted polynomial"""
-        encrypted_attrs = pickle.loads(encrypted_car)
-        enc_attrs = [PyCtxt(pyfhel=self.HE, bytestring=attr) for attr in encrypted_attrs]
-        
-        result = self.encrypted_polynomial[0].copy()
-        idx = 1
-        
-        # Linear terms
-        for i in range(10):
-            term = self.encrypted_polynomial[idx] * enc_attrs[i]
-            result += term
-            idx += 1
-        
-        # Quadratic terms
-        for i in range(10):
-            term = self.encrypted_polynomial[idx] * enc_attrs[i] * enc_attrs[i]
-            result += term
-            idx += 1
-        
-        # Cross terms
-        for i in range(10):
-            for j in range(i+1, 10):
-                term = self.encrypted_polynomial[idx] * enc_attrs[i] * enc_attrs[j]
-                result += term
-                idx += 1
-        
-        return result.to_bytes()
+        enc_car = PyCtxt(pyfhel=self.HE, bytestring=encrypted_car)
+        return evaluate_speed(self.HE, enc_car, self.plain_polynomial).to_bytes()
     
     def decrypt_speed(self, encrypted_speed: bytes) -> int:
         """Decrypt a speed value and apply modulo 1001 to ensure positive value"""
@@ -183,57 +177,69 @@ class ExternalProgram:
         # decryptInt returns an array, get the first element and apply modulo 1001
         return int(speed[0]) % 1001
     
-    # def decrypt_car(self, encrypted_car: bytes) -> List[int]:
-    #     """Decrypt a car (for debugging purposes)"""
-    #     ctxt = PyCtxt(pyfhel=self.HE, bytestring=encrypted_car)
-    #     decrypted_array = self.HE.decryptInt(ctxt)
-    #     return decrypted_array.tolist()
     def decrypt_car(self, encrypted_car: bytes) -> List[int]:
         """Decrypt a car (for debugging purposes)"""
-        # Unpickle to get the list of encrypted attribute bytes
-        encrypted_attrs = pickle.loads(encrypted_car)
-        decrypted = []
-        for attr_bytes in encrypted_attrs:
-            ctxt = PyCtxt(pyfhel=self.HE, bytestring=attr_bytes)
-            val = self.HE.decryptInt(ctxt)
-            # decryptInt returns an array, get the first element
-            decrypted.append(int(val[0]))
-        return decrypted
+        ctxt = PyCtxt(pyfhel=self.HE, bytestring=encrypted_car)
+        decrypted_array = self.HE.decryptInt(ctxt)
+        # The attributes sit in the first 10 slots
+        return decrypted_array[:10].tolist()
     
     def save_state(self, filename: str):
-        """Save program state to file"""
-        state = {
+        """
+        Save program state to file
+        Layout: header length (uint32 LE), JSON header, then the raw blobs back to back
+        """
+        blobs = {
             'signing_key': bytes(self.signing_key),
             'he_secret_key': self.HE.to_bytes_secret_key(),
             'he_context': self.HE.to_bytes_context(),
             'he_public_key': self.HE.to_bytes_public_key(),
-            'speed_polynomial': self.speed_polynomial_coeffs.tolist(),
+            'speed_polynomial': self.speed_polynomial_coeffs.astype('<i8').tobytes(),
             'encrypted_polynomial': self.get_encrypted_polynomial(),
-            'user_counter': self.user_counter
         }
+        header = json.dumps({
+            'user_counter': self.user_counter,
+            'blobs': [[name, len(blob)] for name, blob in blobs.items()]
+        }).encode()
+        
         with open(filename, 'wb') as f:
-            pickle.dump(state, f)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for blob in blobs.values():
+                f.write(blob)
     
     def load_state(self, filename: str):
         """Load program state from file"""
-        with open(filename, 'rb') as f:
-            state = pickle.load(f)
+        # The file is mapped, so each blob is read straight into its own bytes object
+        with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            (header_size,) = struct.unpack_from('<I', mm)
+            offset = 4 + header_size
+            header = json.loads(mm[4:offset])
+            
+            state = {}
+            for name, size in header['blobs']:
+                state[name] = mm[offset:offset + size]
+                offset += size
         
         self.signing_key = nacl.signing.SigningKey(state['signing_key'])
         self.verify_key = self.signing_key.verify_key
+        self._verify = self.verify_key.verify
         
         self.HE = Pyfhel()
         self.HE.from_bytes_context(state['he_context'])
         self.HE.from_bytes_public_key(state['he_public_key'])
         self.HE.from_bytes_secret_key(state['he_secret_key'])
+        # Rotation keys (needed to unpack the SIMD car) are derived from the secret key
+        self.HE.relinKeyGen()
+        self.HE.rotateKeyGen()
         
-        self.speed_polynomial_coeffs = np.array(state['speed_polynomial'])
-        self.encrypted_polynomial = [
-            PyCtxt(pyfhel=self.HE, bytestring=ctxt_bytes) 
-            for ctxt_bytes in state['encrypted_polynomial']
-        ]
+        self.speed_polynomial_coeffs = np.frombuffer(state['speed_polynomial'], dtype='<i8').astype(np.int64)
+        self.plain_polynomial = self._encode_polynomial(
+            self._layout_polynomial(self.speed_polynomial_coeffs)
+        )
+        self.encrypted_polynomial = PyCtxt(pyfhel=self.HE, bytestring=state['encrypted_polynomial'])
         
-        self.user_counter = state['user_counter']
+        self.user_counter = header['user_counter']
 
 
 if __name__ == "__main__":
@@ -259,5 +265,5 @@ if __name__ == "__main__":
         print(f"  Speed: {speed}")
     
     print("\n=== Saving State ===")
-    program.save_state("program_state.pkl")
+    program.save_state("program_state.bin")
     print("✓ State saved")
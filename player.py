@@ -4,29 +4,30 @@ Handles player interactions, car management, and race participation
 Uses PyNaCl for signature verification
 """
 
-import pickle
 from Pyfhel import Pyfhel, PyCtxt
+from speed_polynomial import evaluate_speed, unpack_polynomial
 import nacl.signing
 import nacl.encoding
 import nacl.exceptions
-from typing import List, Tuple
+from typing import Tuple
 
 
 class Player:
-    def __init__(self, user_id: int, public_keys: dict, encrypted_polynomial: List[bytes]):
+    def __init__(self, user_id: int, public_keys: dict, encrypted_polynomial: bytes):
         """
         Initialize a player with public keys and encrypted polynomial
         
         Args:
             user_id: Player's unique identifier
             public_keys: Dictionary containing signing public key and HE public keys
-            encrypted_polynomial: List of encrypted polynomial coefficients
+            encrypted_polynomial: Packed encrypted polynomial coefficients
         """
         self.user_id = user_id
         self.xpf_balance = 10  # Starting balance
         
         # Load signing public key using PyNaCl
         self.verify_key = nacl.signing.VerifyKey(public_keys['signing_public_key'])
+        self._verify = self.verify_key.verify
         
         # Initialize Pyfhel and load public keys
         self.HE = Pyfhel()
@@ -35,20 +36,19 @@ class Player:
         self.HE.from_bytes_relin_key(public_keys['he_relin_key'])
         self.HE.from_bytes_rotate_key(public_keys['he_rotate_key'])
         
-        # Load encrypted polynomial
-        self.encrypted_polynomial = [
-            PyCtxt(pyfhel=self.HE, bytestring=ctxt_bytes)
-            for ctxt_bytes in encrypted_polynomial
-        ]
+        # Load encrypted polynomial, each coefficient vector rotated to slot 0 once
+        self.encrypted_polynomial = unpack_polynomial(self.HE, encrypted_polynomial)
         
         # Store player's cars
         self.cars = []  # List of (encrypted_car, signature) tuples
         self.car_speeds = []  # List of encrypted speeds
+        self._ctxt_cache = {}  # car_index -> deserialized PyCtxt of the car
         
     def add_car(self, encrypted_car: bytes, signature: bytes):
         """Add a car to the player's collection"""
         if self.verify_signature(encrypted_car, signature):
             self.cars.append((encrypted_car, signature))
+            self._ctxt_cache[len(self.cars) - 1] = PyCtxt(pyfhel=self.HE, bytestring=encrypted_car)
             print(f"Car added to collection. Total cars: {len(self.cars)}")
         else:
             print("Invalid signature! Car not added.")
@@ -56,11 +56,20 @@ class Player:
     def verify_signature(self, encrypted_car: bytes, signature: bytes) -> bool:
         """Verify a car's signature using PyNaCl"""
         try:
-            self.verify_key.verify(encrypted_car, signature)
+            self._verify(encrypted_car, signature)
             return True
         except nacl.exceptions.BadSignatureError:
             return False
     
+    def _car_ctxt(self, car_index: int) -> PyCtxt:
+        """Deserialized ciphertext of a car, cached until the car is retrained"""
+        enc_car = self._ctxt_cache.get(car_index)
+        if enc_car is None:
+            encrypted_car, _ = self.cars[car_index]
+            enc_car = PyCtxt(pyfhel=self.HE, bytestring=encrypted_car)
+            self._ctxt_cache[car_index] = enc_car
+        return enc_car
+    
     def calculate_car_speed(self, car_index: int) -> bytes:
         """
         Calculate the encrypted speed of one of the player's cars
@@ -70,34 +79,8 @@ class Player:
             print("Invalid car index")
             return None
         
-        encrypted_car, _ = self.cars[car_index]
-        encrypted_attrs = pickle.loads(encrypted_car)
-        enc_attrs = [PyCtxt(pyfhel=self.HE, bytestring=attr) for attr in encrypted_attrs]
-        
-        # Calculate speed using encrypted polynomial
-        result = self.encrypted_polynomial[0].copy()
-        idx = 1
-        
-        # Linear terms
-        for i in range(10):
-            term = self.encrypted_polynomial[idx] * enc_attrs[i]
-            result += term
-            idx += 1
-        
-        # Quadratic terms
-        for i in range(10):
-            term = self.encrypted_polynomial[idx] * enc_attrs[i] * enc_attrs[i]
-            result += term
-            idx += 1
-        
-        # Cross terms
-        for i in range(10):
-            for j in range(i+1, 10):
-                term = self.encrypted_polynomial[idx] * enc_attrs[i] * enc_attrs[j]
-                result += term
-                idx += 1
-        
-        encrypted_speed = result.to_bytes()
+        enc_car = self._car_ctxt(car_index)
+        encrypted_speed = evaluate_speed(self.HE, enc_car, self.encrypted_polynomial).to_bytes()
         
         if car_index >= len(self.car_speeds):
             self.car_speeds.extend([None] * (car_index - len(self.car_speeds) + 1))
@@ -128,6 +111,7 @@ class Player:
         
         if success:
             self.cars[car_index] = (new_car, new_sig)
+            self._ctxt_cache.pop(car_index, None)
             print("Training successful! Car updated.")
             
             enc_speed = self.calculate_car_speed(car_index)
@@ -4,11 +4,15 @@ Handles race management, verification, and result publication
 Uses PyNaCl for signature verification
 """
 
-import pickle
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from Pyfhel import Pyfhel, PyCtxt
+from speed_polynomial import evaluate_speed, unpack_polynomial
 import nacl.signing
 import nacl.encoding
 import nacl.exceptions
+import nacl.bindings
 from typing import List, Tuple, Dict
 from dataclasses import dataclass
 
@@ -20,19 +24,21 @@ class RaceEntry:
     encrypted_car: bytes
     signature: bytes
     encrypted_speed: bytes = None
+    car_ctxt: PyCtxt = None  # encrypted_car deserialized once verified
 
 
 class Server:
-    def __init__(self, public_keys: dict, encrypted_polynomial: List[bytes]):
+    def __init__(self, public_keys: dict, encrypted_polynomial: bytes):
         """
         Initialize the server with public keys
         
         Args:
             public_keys: Dictionary containing signing public key and HE public keys
-            encrypted_polynomial: List of encrypted polynomial coefficients
+            encrypted_polynomial: Packed encrypted polynomial coefficients
         """
         # Load signing public key for verification using PyNaCl
         self.verify_key = nacl.signing.VerifyKey(public_keys['signing_public_key'])
+        self._verify = self.verify_key.verify
         
         # Initialize Pyfhel and load public keys
         self.HE = Pyfhel()
@@ -41,75 +47,99 @@ class Server:
         self.HE.from_bytes_relin_key(public_keys['he_relin_key'])
         self.HE.from_bytes_rotate_key(public_keys['he_rotate_key'])
         
-        # Load encrypted polynomial
-        self.encrypted_polynomial = [
-            PyCtxt(pyfhel=self.HE, bytestring=ctxt_bytes)
-            for ctxt_bytes in encrypted_polynomial
-        ]
+        # Load encrypted polynomial, each coefficient vector rotated to slot 0 once
+        self.encrypted_polynomial = unpack_polynomial(self.HE, encrypted_polynomial)
         
         # Race management
         self.current_race_entries = []
         self.race_results = []
         self.race_counter = 0
         
+        # Signature checks run across cores: PyNaCl releases the GIL inside
+        # libsodium and the verify key is immutable. Pyfhel calls hold the GIL
+        # and share self.HE, so all HE work stays on the calling thread
+        self._pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+    
+    def close(self):
+        """Shut down the verification thread pool"""
+        self._pool.shutdown()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        
     def verify_signature(self, encrypted_car: bytes, signature: bytes) -> bool:
         """Verify a car's signature using PyNaCl"""
         try:
-            self.verify_key.verify(encrypted_car, signature)
+            self._verify(encrypted_car, signature)
             return True
-        except nacl.exceptions.BadSignatureError as e:
-            print(f"Signature verification failed: {e}")
+        except nacl.exceptions.BadSignatureError:
             return False
     
     def accept_race_entry(self, user_id: int, encrypted_car: bytes, signature: bytes) -> bool:
-        """Accept a race entry from a player"""
-        if not self.verify_signature(encrypted_car, signature):
-            print(f"Invalid signature for user {user_id}. Entry rejected.")
+        """
+        Queue a race entry from a player
+        Only the entry's shape is checked here; signatures are verified for all
+        entries at once when the race starts, and invalid ones are dropped then
+        Returns True if the entry was queued
+        """
+        if not encrypted_car or len(signature) != nacl.bindings.crypto_sign_BYTES:
+            print(f"Malformed race entry from user {user_id}. Entry rejected.")
             return False
         
+        # Stored as plain bytes so verification never converts memoryviews/bytearrays
         entry = RaceEntry(
             user_id=user_id,
-            encrypted_car=encrypted_car,
-            signature=signature
+            encrypted_car=bytes(encrypted_car),
+            signature=bytes(signature)
         )
         
         self.current_race_entries.append(entry)
-        print(f"Race entry accepted from user {user_id}. Total entries: {len(self.current_race_entries)}")
+        print(f"Race entry queued for user {user_id}. Total entries: {len(self.current_race_entries)}")
         
         return True
     
+    def verify_entries(self) -> int:
+        """
+        Verify the signatures of all pending entries in parallel and
+        deserialize the cars of the valid ones
+        Entries with an invalid signature are dropped; returns the number kept
+        """
+        entries = self.current_race_entries
+        valid = list(self._pool.map(
+            self.verify_signature,
+            [e.encrypted_car for e in entries],
+            [e.signature for e in entries]
+        ))
+        
+        valid_entries = []
+        for entry, ok in zip(entries, valid):
+            if not ok:
+                print(f"Invalid signature for user {entry.user_id}. Entry rejected.")
+                continue
+            try:
+                entry.car_ctxt = PyCtxt(pyfhel=self.HE, bytestring=entry.encrypted_car)
+            except Exception as e:
+                print(f"Malformed car for user {entry.user_id} ({e}). Entry rejected.")
+                continue
+            valid_entries.append(entry)
+        
+        self.current_race_entries = valid_entries
+        return len(valid_entries)
+    
     def calculate_encrypted_speed(self, encrypted_car: bytes) -> bytes:
         """Calculate the encrypted speed of a car using the encrypted polynomial"""
-        encrypted_attrs = pickle.loads(encrypted_car)
-        enc_attrs = [PyCtxt(pyfhel=self.HE, bytestring=attr) for attr in encrypted_attrs]
-        
-        result = self.encrypted_polynomial[0].copy()
-        idx = 1
-        
-        # Linear terms
-        for i in range(10):
-            term = self.encrypted_polynomial[idx] * enc_attrs[i]
-            result += term
-            idx += 1
-        
-        # Quadratic terms
-        for i in range(10):
-            term = self.encrypted_polynomial[idx] * enc_attrs[i] * enc_attrs[i]
-            result += term
-            idx += 1
-        
-        # Cross terms
-        for i in range(10):
-            for j in range(i+1, 10):
-                term = self.encrypted_polynomial[idx] * enc_attrs[i] * enc_attrs[j]
-                result += term
-                idx += 1
-        
-        return result.to_bytes()
+        return self._evaluate_speed(PyCtxt(pyfhel=self.HE, bytestring=encrypted_car))
+    
+    def _evaluate_speed(self, enc_car: PyCtxt) -> bytes:
+        """Evaluate the encrypted polynomial on an already deserialized car"""
+        return evaluate_speed(self.HE, enc_car, self.encrypted_polynomial).to_bytes()
     
     def run_race(self, program_interface) -> Dict:
         """Run the race with all current entries"""
-        if len(self.current_race_entries) == 0:
+        if self.verify_entries() == 0:
             print("No entries for the race!")
             return None
         
@@ -117,30 +147,41 @@ class Server:
         print(f"\n=== Running Race #{self.race_counter} ===")
         print(f"Participants: {len(self.current_race_entries)}")
         
-        print("\nCalculating speeds...")
-        for entry in self.current_race_entries:
-            entry.encrypted_speed = self.calculate_encrypted_speed(entry.encrypted_car)
-        
-        print("Requesting speed decryption from external program...")
+        print("\nCalculating speeds and requesting their decryption from external program...")
+        # Only speeds the server computed itself are sent for decryption, so the
+        # program never decrypts a ciphertext chosen by a player.
         # Speed is decrypted and modulo 1001 is applied to ensure positive values
+        entries = []
         decrypted_speeds = []
-        for i, entry in enumerate(self.current_race_entries):
-            speed = program_interface.decrypt_speed(entry.encrypted_speed)
+        for entry in self.current_race_entries:
+            try:
+                entry.encrypted_speed = self._evaluate_speed(entry.car_ctxt)
+                speed = program_interface.decrypt_speed(entry.encrypted_speed)
+            except Exception as e:
+                print(f"Speed of user {entry.user_id} could not be computed ({e}). Entry disqualified.")
+                continue
+            entries.append(entry)
             decrypted_speeds.append(speed)
             print(f"  User {entry.user_id}: Speed = {speed}")
         
-        # Sort results by speed (descending)
-        results = list(zip(self.current_race_entries, decrypted_speeds))
-        results.sort(key=lambda x: x[1], reverse=True)
+        if not entries:
+            print("No valid entries left for the race!")
+            self.current_race_entries = []
+            return None
+        
+        # Rank entry indices by speed (descending); the stable sort keeps
+        # entry order for ties
+        order = np.argsort(-np.array(decrypted_speeds), kind='stable').tolist()
         
         race_result = {
             'race_id': self.race_counter,
-            'participants': len(results),
+            'participants': len(order),
             'rankings': []
         }
         
         print("\n=== Race Results ===")
-        for rank, (entry, speed) in enumerate(results, 1):
+        for rank, i in enumerate(order, 1):
+            entry, speed = entries[i], decrypted_speeds[i]
             result_entry = {
                 'rank': rank,
                 'user_id': entry.user_id,
@@ -154,8 +195,8 @@ class Server:
         
         self.race_results.append(race_result)
         
-        winner = results[0][0]
-        print(f"\n🏆 Winner: User {winner.user_id} with speed {results[0][1]}!")
+        winner = entries[order[0]]
+        print(f"\n🏆 Winner: User {winner.user_id} with speed {decrypted_speeds[order[0]]}!")
         
         self.current_race_entries = []
         
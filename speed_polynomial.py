@@ -0,0 +1,52 @@
+"""
+Speed Polynomial for F1-AI Racing Game
+Slot layout and homomorphic evaluation shared by the external program,
+players and the server
+"""
+
+from itertools import accumulate
+from typing import List
+from Pyfhel import Pyfhel, PyCtxt
+
+
+# Length of each slot vector the 66 coefficients are laid out in: constant,
+# linear (10), quadratic (10), then the cross terms a_i * a_(i+r) for r = 1..9
+POLYNOMIAL_BLOCKS = (1, 10, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1)
+# Slot where each vector starts when they are packed back to back
+POLYNOMIAL_OFFSETS = tuple(accumulate(POLYNOMIAL_BLOCKS[:-1], initial=0))
+
+
+def unpack_polynomial(HE: Pyfhel, encrypted_polynomial: bytes) -> List[PyCtxt]:
+    """Load the packed encrypted polynomial and rotate each coefficient vector to slot 0"""
+    packed = PyCtxt(pyfhel=HE, bytestring=encrypted_polynomial)
+    return [packed << offset if offset else packed for offset in POLYNOMIAL_OFFSETS]
+
+
+def evaluate_speed(HE: Pyfhel, enc_car: PyCtxt, polynomial: list) -> PyCtxt:
+    """
+    Evaluate the speed polynomial on an encrypted car; the speed ends up in slot 0
+    polynomial: the coefficient vectors in layout order, as ciphertexts or plaintexts
+    """
+    const, linear, quadratic, *cross = polynomial
+
+    # Slot i accumulates L_i + Q_i*a_i + sum_r X_r[i]*a_(i+r), so that
+    # multiplying by the car gives every non-constant term in some slot
+    acc = enc_car * quadratic
+    for r, coeffs in enumerate(cross, 1):
+        term = enc_car << r
+        term *= coeffs
+        acc += term
+    acc += linear
+    # Only ciphertext coefficients grow the accumulator to three polynomials
+    if isinstance(quadratic, PyCtxt):
+        HE.relinearize(acc)
+
+    acc *= enc_car
+    HE.relinearize(acc)
+
+    # Sum the slots into slot 0 (the terms only occupy slots 0-9)
+    for step in (1, 2, 4, 8):
+        acc += acc << step
+    acc += const
+
+    return acc